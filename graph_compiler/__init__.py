@@ -1,4 +1,4 @@
-from .graph import Graph
+from .graph import Graph, SkeletonCache
 from .compiler import GraphCompiler
 
-__all__ = ['Graph', 'GraphCompiler']
\ No newline at end of file
+__all__ = ['Graph', 'SkeletonCache', 'GraphCompiler']
\ No newline at end of file
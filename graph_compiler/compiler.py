@@ -1,11 +1,26 @@
-from typing import Dict, List, Any, Callable
+from typing import Dict, List, Set, Tuple, Any, Callable, Optional, Hashable
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import threading
 import numpy as np
 
 
+MEMO_HASH_LIMIT = 1 << 16
+'''Массивы не больше этого размера (в байтах) входят в ключ мемоизации содержимым,
+более крупные - адресом данных, формой и шагами'''
+
+
 class CompiledGraph:
     '''Скомпилированный граф - хранит состояние компилированной функции'''
 
-    def __init__(self, calculator: Callable, input_ids: List[str], output_ids: List[str]):
+    def __init__(
+        self,
+        calculator: Callable,
+        input_ids: List[str],
+        output_ids: List[str],
+        memo: Optional[Dict[str, OrderedDict]] = None,
+        typed_calculator: Optional[Callable] = None
+    ):
         '''
         Инициализирует скомпилированный граф.
 
@@ -13,10 +28,15 @@ class CompiledGraph:
         calculator: Исполняемая функция графа, принимает входные значения и возвращает выходные
         input_ids: Список идентификаторов входных узлов (их UID)
         output_ids: Список идентификаторов выходных узлов (их UID)
+        memo: Кэши мемоизации вычислительных узлов {node_id: cache}, если она включена
+        typed_calculator: Опциональная функция графа с позиционными входами
+        и кортежем выходов (см. execute_typed)
         '''
         self.calculator = calculator
         self.input_ids = input_ids
         self.output_ids = output_ids
+        self.memo = memo or {}
+        self.typed_calculator = typed_calculator
 
     def execute(self, input_values: Dict[str, Any]) -> Dict[str, Any]:
         '''
@@ -33,57 +53,401 @@ class CompiledGraph:
         '''
         return self.calculator(input_values)
 
+    def execute_typed(self, *input_arrays: np.ndarray) -> Tuple[Any, ...]:
+        '''
+        Выполняет вычисления на графе с позиционными входами.
+
+        Args:
+        input_arrays: Значения входов в порядке уникальных UID из input_ids.
+        Передаются в узлы как есть, без поиска по словарю, без np.asarray и без
+        приведения к data['dtype'] входного узла, поэтому должны уже быть массивами
+        нужного типа
+
+        Returns:
+        Кортеж выходных значений в порядке output_ids
+
+        Example:
+        python double, square = compiled_graph.execute_typed(a, b)
+        '''
+        if self.typed_calculator is not None:
+            return self.typed_calculator(*input_arrays)
+
+        input_uids = list(dict.fromkeys(self.input_ids))
+        outputs = self.calculator(dict(zip(input_uids, input_arrays)))
+        return tuple(outputs[uid] for uid in self.output_ids)
+
+    def execute_batch(self, batch: List[Dict[str, Any]], vectorized: bool = False) -> List[Dict[str, Any]]:
+        '''
+        Выполняет граф для набора входных значений.
+
+        Args:
+        batch: Список словарей входных значений вида {input_uid: value}
+        vectorized: Выполнить граф один раз, сложив входы в массивы по новой первой оси
+        (см. stack_batch_inputs). Допустимо, только если все функции узлов поэлементные
+        (семантика broadcasting NumPy): свертки, матричные произведения и другие
+        операции, зависящие от формы, дадут неверный результат без ошибки.
+        По умолчанию граф выполняется для каждого элемента по отдельности
+
+        Returns:
+        Список словарей выходных значений, по одному на каждый элемент batch
+
+        Raises:
+        ValueError: При vectorized=True какой-либо выход не содержит оси набора
+
+        Note:
+        Если при vectorized=True входы нельзя сложить (разные ключи или формы,
+        dtype object, несовместимые для broadcasting формы), граф выполняется
+        для каждого элемента по отдельности. Функции узлов в любом случае
+        вызываются только одним из двух способов
+
+        Example:
+        python results = compiled_graph.execute_batch(batch, vectorized=True)
+        '''
+        stacked = stack_batch_inputs(batch) if vectorized else None
+        if stacked is None:
+            return [self.calculator(input_values) for input_values in batch]
+
+        outputs = self.calculator(stacked)
+        size = len(batch)
+        for uid, value in outputs.items():
+            if not (isinstance(value, np.ndarray) and value.ndim and value.shape[0] == size):
+                raise ValueError(
+                    f'Выход {uid!r} не содержит оси набора: функции узлов не поэлементные'
+                )
+
+        return [
+            {uid: value[i] for uid, value in outputs.items()}
+            for i in range(size)
+        ]
+
+    def invalidate(self, node_id: Optional[str] = None) -> None:
+        '''
+        Сбрасывает кэш мемоизации.
+
+        Args:
+        node_id: ID вычислительного узла. Если не указан, сбрасываются кэши всех узлов
+
+        Note:
+        Крупные массивы входят в ключ по адресу данных, поэтому после изменения
+        такого массива на месте кэш нужно сбросить вручную
+        '''
+        if node_id is None:
+            for cache in self.memo.values():
+                cache.clear()
+        elif node_id in self.memo:
+            self.memo[node_id].clear()
+
+
+def stack_batch_inputs(batch: List[Dict[str, Any]]) -> Optional[Dict[str, np.ndarray]]:
+    '''
+    Переводит набор входных словарей в словарь массивов с новой первой осью.
+
+    Args:
+    batch: Список словарей входных значений вида {input_uid: value}
+
+    Returns:
+    Словарь {input_uid: массив формы (len(batch), 1, ..., 1, *shape)}.
+    Единичные оси выравнивают число измерений всех входов, чтобы broadcasting
+    внутри одного элемента набора не смешивался с осью набора.
+    None, если набор пуст, у элементов разные ключи, формы значений одного
+    входа различаются, формы разных входов несовместимы для broadcasting
+    или значения не числовые (dtype object)
+    '''
+    if not batch:
+        return None
+
+    keys = batch[0].keys()
+    if any(input_values.keys() != keys for input_values in batch):
+        return None
+
+    stacked = {}
+    for key in keys:
+        try:
+            array = np.stack([np.asarray(input_values[key]) for input_values in batch])
+        except ValueError:
+            return None
+        if array.dtype == object:
+            return None
+        stacked[key] = array
+
+    try:
+        np.broadcast_shapes(*(array.shape[1:] for array in stacked.values()))
+    except ValueError:
+        return None
+
+    ndim = max((array.ndim for array in stacked.values()), default=1)
+    for key, array in stacked.items():
+        if array.ndim < ndim:
+            stacked[key] = array.reshape(array.shape[:1] + (1,) * (ndim - array.ndim) + array.shape[1:])
+
+    return stacked
+
+
+def make_memo_key(value: Any) -> Hashable:
+    '''
+    Строит ключ мемоизации для одного входного значения.
+
+    Args:
+    value: Входное значение узла
+
+    Returns:
+    Для небольших массивов - (dtype, shape, байты содержимого),
+    для крупных - (dtype, shape, strides, адрес данных),
+    для остальных значений - само значение
+    '''
+    if isinstance(value, np.ndarray):
+        if value.nbytes <= MEMO_HASH_LIMIT:
+            return (value.dtype.str, value.shape, value.tobytes())
+        return (value.dtype.str, value.shape, value.strides, value.ctypes.data)
+    return value
+
+
+def create_memoized_func(node_func: Callable, cache: OrderedDict, max_size: int) -> Callable:
+    '''
+    Оборачивает функцию узла LRU-кэшем по значениям входов.
+
+    Args:
+    node_func: Функция узла из nodes_pool
+    cache: Словарь-кэш узла {key: (result, input_values)}
+    max_size: Максимальное число записей в кэше
+
+    Returns:
+    Функция с той же сигнатурой, что и node_func
+
+    Note:
+    Предполагается, что результат узла зависит только от node_inputs.
+    Вместе с результатом хранятся сами входы, чтобы адреса крупных массивов
+    не могли быть переиспользованы, пока запись в кэше.
+    Входы с нехешируемыми значениями не кэшируются
+    '''
+    def memoized_func(node, node_inputs: Dict[str, Any], results: Dict[str, Any]) -> Any:
+        try:
+            key = tuple(make_memo_key(value) for value in node_inputs.values())
+            entry = cache.get(key)
+        except TypeError:
+            return node_func(node=node, node_inputs=node_inputs, results=results)
+
+        if entry is not None:
+            cache.move_to_end(key)
+            return entry[0]
+
+        result = node_func(node=node, node_inputs=node_inputs, results=results)
+        cache[key] = (result, tuple(node_inputs.values()))
+        if len(cache) > max_size:
+            cache.popitem(last=False)
+        return result
+
+    return memoized_func
+
+
+def make_node_error(node, error: Exception) -> RuntimeError:
+    '''
+    Создает RuntimeError с указанием ID и UID узла, в котором произошла ошибка.
+
+    Args:
+    node: Объект узла
+    error: Исходное исключение
+
+    Returns:
+    Исключение для перевыбрасывания через raise ... from error
+    '''
+    return RuntimeError(f'Ошибка в узле {node.id!r} (uid={node.uid!r}): {error!r}')
+
+
+def create_debug_node_func(node, node_func: Callable) -> Callable:
+    '''
+    Оборачивает скомпилированную функцию узла для отладки.
+
+    Args:
+    node: Объект узла
+    node_func: Скомпилированная функция вычислительного узла
+
+    Returns:
+    Функция с той же сигнатурой, которая перевыбрасывает любое исключение
+    как RuntimeError с указанием ID и UID узла (make_node_error)
+    '''
+    def debug_func(*args) -> Any:
+        try:
+            return node_func(*args)
+        except Exception as error:
+            raise make_node_error(node, error) from error
+
+    return debug_func
+
+
+def create_kernel_adapter(kernel: Callable, input_slots: Tuple[str, ...]) -> Callable:
+    '''
+    Приводит функцию-ядро к обычной сигнатуре функции узла.
+
+    Ядро - функция узла с атрибутом input_slots (кортеж имен входов), которая
+    принимает значения входов позиционно в этом порядке, без node и results.
+    Такую функцию можно заранее скомпилировать, например numba.njit, и
+    компилятор вызовет ее напрямую, без сборки словаря node_inputs.
+
+    Args:
+    kernel: Функция-ядро
+    input_slots: Имена входов в порядке позиционных аргументов ядра
+
+    Returns:
+    Функция с сигнатурой func(node, node_inputs, results) -> Any
+    '''
+    def kernel_adapter(node, node_inputs: Dict[str, Any], results: Dict[str, Any]) -> Any:
+        return kernel(*[node_inputs[slot] for slot in input_slots])
+
+    return kernel_adapter
+
+
+def check_kernel_slots(node, node_func: Callable, input_sources: Dict[str, tuple]) -> None:
+    '''
+    Проверяет, что у функции-ядра подключены все входы из input_slots.
+
+    Args:
+    node: Объект вычислительного узла
+    node_func: Функция узла из nodes_pool
+    input_sources: Словарь входных соединений узла {slot: ('source_id', 'source_output')}
+
+    Raises:
+    ValueError: Какой-либо вход из input_slots не подключен. Обычная функция узла
+    в этом случае просто не получает ключ в node_inputs, но ядру нечего передать
+    в позиционный аргумент
+    '''
+    for slot in getattr(node_func, 'input_slots', None) or ():
+        if slot not in input_sources:
+            raise ValueError(
+                f'Узел {node.id!r} (uid={node.uid!r}): вход ядра {slot!r} не подключен'
+            )
+
 
 def create_input_node_func(node) -> Callable:
     '''
     Создает функцию для входного узла.
 
     Args:
-    node: Объект узла Graph.Node, должен содержать uid
+    node: Объект узла Graph.Node, должен содержать uid.
+    Если в node.data указан 'dtype', входное значение приводится к нему
 
     Returns:
     Функция, которая извлекает значение из input_values по uid узла
-    и преобразует его в numpy.ndarray
+    и преобразует его в numpy.ndarray без копирования, если это возможно
     '''
     uid = node.uid
+    dtype = node.data.get('dtype')
+
+    if dtype is not None:
+        dtype = np.dtype(dtype)
+
+        def typed_input_func(input_values: Dict[str, Any]) -> Any:
+            return np.asarray(input_values[uid], dtype=dtype)
+
+        return typed_input_func
 
     def input_func(input_values: Dict[str, Any]) -> Any:
         value = input_values[uid]
         if isinstance(value, np.ndarray):
             return value
-        return np.array(value)
+        return np.asarray(value)
 
     return input_func
 
 
-def create_output_node_func(input_sources: Dict[str, tuple]) -> Callable:
+def create_output_node_func(input_sources: Dict[str, tuple], index: Dict[str, int]) -> Callable:
     '''
     Создает функцию для выходного узла (out).
     
     Особенности:
-    - У выходного узла всегда один вход через слот 'input'
+    - Обычно у выходного узла один вход (слот 'input' или любой другой)
     - Нет выходов
     - Просто возвращает значение, пришедшее на вход
+    - Вариант функции выбирается по числу входов на этапе компиляции
     
     Args:
-        input_sources: Всегда содержит один ключ 'input': ('source_id', 'source_output')
+        input_sources: Словарь входов {slot: ('source_id', 'source_output')}
+        index: Позиции узлов в списке значений {node_id: position}
+
+    Returns:
+    Функция output_func(values):
+    - без входов возвращает None
+    - с одним входом (или при наличии слота 'input') возвращает его значение
+    - с несколькими входами возвращает словарь {slot: value}
     '''
-    if 'input' not in input_sources:
-        def output_func(results: Dict[str, Any]) -> Any:
+    if not input_sources:
+        def empty_output_func(values: List[Any]) -> Any:
             return None
+        return empty_output_func
+
+    if 'input' in input_sources or len(input_sources) == 1:
+        source_id, source_output = input_sources.get('input') or next(iter(input_sources.values()))
+        source_index = index[source_id]
+
+        def output_func(values: List[Any]) -> Any:
+            value = values[source_index]
+
+            if isinstance(value, dict):
+                return value[source_output]
+
+            return value
+
         return output_func
 
-    source_id, source_output = input_sources['input']
-    
-    def output_func(results: Dict[str, Any]) -> Any:
-        value = results[source_id]
-        
-        if isinstance(value, dict):
-            return value[source_output]
-        
+    slots = tuple(
+        (slot, index[source_id], source_output)
+        for slot, (source_id, source_output) in input_sources.items()
+    )
+
+    def multi_output_func(values: List[Any]) -> Dict[str, Any]:
+        outputs = {}
+        for slot, source_index, source_output in slots:
+            value = values[source_index]
+            if isinstance(value, dict):
+                value = value[source_output]
+            outputs[slot] = value
+        return outputs
+
+    return multi_output_func
+
+
+def create_constant_node_func(value: Any) -> Callable:
+    '''
+    Создает функцию для вычислительного узла, свернутого в константу при компиляции.
+
+    Args:
+    value: Результат узла, вычисленный в GraphCompiler._fold_constants
+
+    Returns:
+    Функция с сигнатурой вычислительного узла (values, results), возвращающая value
+    '''
+    def constant_func(values: List[Any], results: Dict[str, Any]) -> Any:
         return value
-    
-    return output_func
+    return constant_func
+
+
+def create_node_handler(node, node_func: Callable) -> Callable:
+    '''
+    Создает обработчик узла с единой сигнатурой для цикла выполнения.
+
+    Args:
+    node: Объект узла
+    node_func: Скомпилированная функция узла
+
+    Returns:
+    Функция handler(input_values, values, results) -> Any, которая вызывает
+    node_func с аргументами, нужными для данного типа узла, и возвращает
+    результат; сохраняет его вызывающий код. Тип узла проверяется один раз
+    при создании
+    '''
+    if node.type == 'in':
+        def input_handler(input_values, values, results) -> Any:
+            return node_func(input_values)
+        return input_handler
+
+    if node.type == 'out':
+        def output_handler(input_values, values, results) -> Any:
+            return node_func(values)
+        return output_handler
+
+    def computation_handler(input_values, values, results) -> Any:
+        return node_func(values, results)
+    return computation_handler
 
 
 class GraphCompiler:
@@ -91,20 +455,73 @@ class GraphCompiler:
     Класс компилятора - хранит доступные функции
     '''
 
-    def __init__(self, nodes_pool: Dict[str, Callable], updater=None):
+    def __init__(
+        self,
+        nodes_pool: Dict[str, Callable],
+        updater=None,
+        max_workers: Optional[int] = None,
+        enable_memoization: bool = False,
+        memo_size: int = 128,
+        debug: bool = False,
+        cache_size: int = 0,
+        reuse_node_inputs: bool = False,
+        fold_constants: bool = False
+    ):
         '''
         Инициализирует компилятор.
 
         Args:
         nodes_pool: Словарь доступных вычислительных функций.
         Ключи - UID типов узлов, значения - функции вычисления.
-        Формат функции: func(node, node_inputs, results) -> Any
+        Формат функции: func(node, node_inputs, results) -> Any.
+        Функция может объявить атрибут returns_dict (True/False), тогда
+        проверка isinstance(value, dict) для ее выходов убирается при компиляции.
+        Функция с атрибутом input_slots вызывается как ядро: func(*inputs)
+        (см. create_kernel_adapter). Функция с release_gil = False не отправляется
+        в пул потоков при max_workers > 1
         updater: Опциональная функция обратного вызова для отслеживания прогресса.
         Вызывается для каждого узла с аргументами (progress, node_uid),
         где progress от 0.0 до 1.0
+        max_workers: Размер пула потоков для параллельного выполнения независимых
+        узлов одного уровня. None или 1 - последовательное выполнение.
+        Имеет смысл для узлов, отпускающих GIL (операции NumPy)
+        enable_memoization: Кэшировать результаты вычислительных узлов между
+        вызовами execute по значениям их входов. Только для чистых функций узлов.
+        Отдельный узел можно кэшировать и без этого флага, указав в его data
+        'memoize': True
+        memo_size: Максимальное число записей в кэше одного узла
+        debug: Оборачивать ошибки вычислительных узлов в RuntimeError с ID и UID
+        узла. По умолчанию выключено, чтобы не тратить время на try/except
+        cache_size: Число скомпилированных графов, хранимых в кэше по структурному
+        ключу (Graph.structure_key). По умолчанию 0 - кэш выключен. Кэш не отслеживает
+        изменения nodes_pool после создания компилятора. При попадании в кэш
+        возвращается тот же объект CompiledGraph: у таких графов общие кэши
+        мемоизации (invalidate сбрасывает их для всех) и буферы reuse_node_inputs
+        reuse_node_inputs: Передавать в функцию узла один и тот же словарь node_inputs,
+        перезаписывая значения между вызовами, вместо создания нового. Экономит
+        аллокацию на каждый узел, но функции узлов не должны сохранять node_inputs,
+        а один CompiledGraph нельзя выполнять из нескольких потоков одновременно.
+        Действует только для последовательного калькулятора
+        fold_constants: Вычислять при компиляции узлы, не зависящие от входов графа
+        (см. _fold_constants), и подставлять их результаты как константы.
+        Только для чистых функций узлов
         '''
         self.nodes_pool = nodes_pool
         self.updater = updater
+        self.max_workers = max_workers
+        self.enable_memoization = enable_memoization
+        self.memo_size = memo_size
+        self.debug = debug
+        self.cache_size = cache_size
+        self.reuse_node_inputs = reuse_node_inputs
+        self.fold_constants = fold_constants
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._compile_cache: OrderedDict = OrderedDict()
+        # Кэш читается и изменяется под блокировкой: compile можно вызывать
+        # из нескольких потоков, а вытеснение не должно попасть между поиском
+        # ключа и move_to_end
+        self._compile_cache_lock = threading.Lock()
 
     def compile(self, graph: 'Graph') -> CompiledGraph:
         '''
@@ -116,61 +533,403 @@ class GraphCompiler:
         Returns:
         Объект CompiledGraph, готовый к выполнению
 
+        Raises:
+        ValueError: У функции-ядра не подключен один из входов input_slots
+        (см. check_kernel_slots)
+
         Process:
-        1. Компилирует все узлы графа в отдельные функции
-        2. Создает общую функцию-калькулятор, которая:
+        1. Генерирует общую функцию-калькулятор (_build_calculator), которая:
         - Принимает входные значения
         - Последовательно вычисляет узлы в топологическом порядке
+          без интерпретирующего цикла по списку узлов
         - Собирает результаты
         - Возвращает выходные значения
-        3. Возвращает CompiledGraph с калькулятором и метаданными
+        При max_workers > 1 вместо этого компилирует узлы в отдельные
+        функции (_compile_nodes) и собирает из них калькулятор по уровням
+        2. Возвращает CompiledGraph с калькулятором и метаданными
 
         Note:
-        Порядок вычислений определяется топологической сортировкой графа
+        Порядок вычислений определяется топологической сортировкой графа.
+        При max_workers > 1 узлы группируются по уровням (Graph.layers)
+        и независимые узлы уровня выполняются в пуле потоков.
+        При cache_size > 0 структурно одинаковые графы компилируются один раз:
+        повторный вызов возвращает тот же CompiledGraph из кэша компилятора
+        (см. описание cache_size). Кэш безопасен для вызова compile из нескольких
+        потоков; граф, который компилируется в двух потоках одновременно,
+        может быть скомпилирован дважды
+        '''
+        key = graph.structure_key() if self.cache_size > 0 else None
+        if key is not None:
+            with self._compile_cache_lock:
+                cached = self._compile_cache.get(key)
+                if cached is not None:
+                    self._compile_cache.move_to_end(key)
+                    return cached
+
+        memo = {}
+
+        typed_calculator = None
+
+        if self.max_workers and self.max_workers > 1:
+            compiled_nodes = self._compile_nodes(graph, memo)
+            calculator = self._build_level_calculator(graph, compiled_nodes)
+        else:
+            calculator, typed_calculator = self._build_calculator(graph, memo)
+
+        compiled_graph = CompiledGraph(
+            calculator=calculator,
+            input_ids=graph.input_ids,
+            output_ids=graph.output_ids,
+            memo=memo,
+            typed_calculator=typed_calculator
+        )
+
+        if key is not None:
+            with self._compile_cache_lock:
+                self._compile_cache[key] = compiled_graph
+                self._compile_cache.move_to_end(key)
+                while len(self._compile_cache) > self.cache_size:
+                    self._compile_cache.popitem(last=False)
+
+        return compiled_graph
+
+    def _build_calculator(
+        self,
+        graph: 'Graph',
+        memo: Optional[Dict[str, OrderedDict]] = None
+    ) -> Tuple[Callable, Callable]:
+        '''
+        Внутренний метод: генерирует функцию-калькулятор графа.
+
+        Args:
+        graph: Объект Graph
+        memo: Словарь для кэшей мемоизации (см. _get_node_func)
+
+        Returns:
+        Кортеж функций:
+        - calculator(input_values) -> outputs
+        - typed_calculator(*input_arrays) -> tuple выходов в порядке output_ids
+
+        Note:
+        Вместо цикла по узлам генерируется линейный исходный код, в котором
+        работа каждого узла встроена прямо в тело калькулятора: чтение входа,
+        сборка node_inputs литералом словаря, вызов функции из nodes_pool и
+        запись выхода. Промежуточные функции-замыкания не вызываются, а
+        результаты хранятся в локальных переменных v0..vN-1, а используемые
+        выходы узлов, возвращающих словарь, - в отдельных переменных o0..oK-1;
+        словарь results заполняется параллельно только для передачи в функции узлов.
+        Генерируются два варианта: с вызовами updater и без них. Наличие
+        updater проверяется один раз за вызов, а не перед каждым узлом.
+        typed_calculator отличается только чтением входов: они приходят
+        позиционными аргументами и не проходят через np.asarray.
         '''
-        compiled_nodes = self._compile_nodes(graph)
         node_count = len(graph.sort)
+        index = {node_id: i for i, node_id in enumerate(graph.sort)}
+        plain_sources, dict_sources = self._classify_sources(graph)
+        constants = self._fold_constants(graph) if self.fold_constants else {}
+        for node_id, value in constants.items():
+            (dict_sources if isinstance(value, dict) else plain_sources).add(node_id)
+        namespace = {
+            'compiler': self,
+            'ndarray': np.ndarray,
+            'asarray': np.asarray,
+            'make_node_error': make_node_error,
+        }
+
+        # Каждый используемый выход (узел, слот) узла, который может вернуть словарь,
+        # извлекается один раз сразу после вызова узла в свою переменную o0..oK-1.
+        # Потребители читают готовую переменную без поиска по словарю и isinstance
+        slot_vars = {}
+        for node_id in graph.sort:
+            for source in graph.inputs.get(node_id, {}).values():
+                if source[0] in index and source[0] not in plain_sources:
+                    slot_vars.setdefault(source, f'o{len(slot_vars)}')
+
+        def source_expression(source_id: str, source_output: str) -> str:
+            return slot_vars.get((source_id, source_output)) or f'v{index[source_id]}'
+
+        def slot_extraction(node_id: str) -> List[str]:
+            var = f'v{index[node_id]}'
+            statements = []
+            for (source_id, source_output), slot_var in slot_vars.items():
+                if source_id != node_id:
+                    continue
+                if source_id in dict_sources:
+                    statements.append(f'{slot_var} = {var}[{source_output!r}]')
+                else:
+                    statements.append(
+                        f'{slot_var} = {var}[{source_output!r}] if isinstance({var}, dict) else {var}'
+                    )
+            return statements
+
+        params = {uid: f'p{k}' for k, uid in enumerate(dict.fromkeys(graph.input_ids))}
+        blocks = []
+        typed_blocks = []
+        progress = []
+
+        for i, node in enumerate(graph):
+            input_sources = graph.inputs.get(node.id, {})
+            progress.append(f'    updater({(i + 1) / node_count!r}, {node.id!r})')
 
-        node_list = [
-            (node_id, graph.nodes[node_id], compiled_nodes[node_id])
-            for node_id in graph.sort
+            if node.type == 'in':
+                dtype = node.data.get('dtype')
+                if dtype is not None:
+                    namespace[f'dtype{i}'] = np.dtype(dtype)
+                    block = [f'    v{i} = asarray(input_values[{node.uid!r}], dtype=dtype{i})']
+                else:
+                    block = [
+                        f'    v{i} = input_values[{node.uid!r}]',
+                        f'    if not isinstance(v{i}, ndarray):',
+                        f'        v{i} = asarray(v{i})',
+                    ]
+                block.append(f'    results[{node.id!r}] = v{i}')
+                typed_blocks.append([
+                    f'    v{i} = {params[node.uid]}',
+                    f'    results[{node.id!r}] = v{i}',
+                ])
+
+            elif node.type == 'out':
+                if not input_sources:
+                    value = 'None'
+                elif 'input' in input_sources or len(input_sources) == 1:
+                    value = source_expression(*(input_sources.get('input') or next(iter(input_sources.values()))))
+                else:
+                    value = '{' + ', '.join(
+                        f'{slot!r}: {source_expression(*source)}'
+                        for slot, source in input_sources.items()
+                    ) + '}'
+                block = [f'    outputs[{node.uid!r}] = {value}']
+
+            elif node.id in constants:
+                namespace[f'c{i}'] = constants[node.id]
+                block = [
+                    f'    {statement}'
+                    for statement in (f'v{i} = results[{node.id!r}] = c{i}', *slot_extraction(node.id))
+                ]
+
+            else:
+                check_kernel_slots(node, self.nodes_pool[node.uid], input_sources)
+                node_func = self._get_node_func(node, memo)
+                kernel_slots = getattr(node_func, 'input_slots', None)
+                namespace[f'g{i}'] = node_func
+                namespace[f'n{i}'] = node
+
+                statements = []
+
+                if kernel_slots is not None:
+                    args = ', '.join(source_expression(*input_sources[slot]) for slot in kernel_slots)
+                elif self.reuse_node_inputs:
+                    namespace[f'b{i}'] = dict.fromkeys(input_sources)
+                    statements += [
+                        f'b{i}[{slot!r}] = {source_expression(*source)}'
+                        for slot, source in input_sources.items()
+                    ]
+                    args = f'node=n{i}, node_inputs=b{i}, results=results'
+                else:
+                    node_inputs = '{' + ', '.join(
+                        f'{slot!r}: {source_expression(*source)}'
+                        for slot, source in input_sources.items()
+                    ) + '}'
+                    args = f'node=n{i}, node_inputs={node_inputs}, results=results'
+                statements.append(f'v{i} = results[{node.id!r}] = g{i}({args})')
+                statements += slot_extraction(node.id)
+
+                if self.debug:
+                    block = [
+                        '    try:',
+                        *(f'        {statement}' for statement in statements),
+                        '    except Exception as error:',
+                        f'        raise make_node_error(n{i}, error) from error',
+                    ]
+                else:
+                    block = [f'    {statement}' for statement in statements]
+
+            blocks.append(block)
+            if node.type != 'in':
+                typed_blocks.append(block)
+
+        header = ['    results = {}', '    outputs = {}']
+        body = header + [line for block in blocks for line in block] + ['    return outputs']
+
+        # Вариант с updater получает вызов прогресса перед каждым узлом;
+        # вариант без него не содержит ни одной проверки внутри
+        tracked_body = header + [
+            line
+            for progress_line, block in zip(progress, blocks)
+            for line in (progress_line, *block)
+        ] + ['    return outputs']
+
+        param_list = ', '.join(params.values())
+        input_dict = '{' + ', '.join(f'{uid!r}: {param}' for uid, param in params.items()) + '}'
+        output_tuple = ''.join(f'outputs[{uid!r}], ' for uid in graph.output_ids)
+
+        lines = [
+            'def tracked_calculator(input_values, updater):',
+            *tracked_body,
+            '',
+            'def calculator(input_values):',
+            '    updater = compiler.updater',
+            '    if updater:',
+            '        return tracked_calculator(input_values, updater)',
+            *body,
+            '',
+            f'def typed_calculator({param_list}):',
+            '    updater = compiler.updater',
+            '    if updater:',
+            f'        outputs = tracked_calculator({input_dict}, updater)',
+            f'        return ({output_tuple})',
+            *header,
+            *[line for block in typed_blocks for line in block],
+            f'    return ({output_tuple})',
         ]
 
+        source = '\n'.join(lines)
+        exec(compile(source, '<graph_compiler>', 'exec'), namespace)
+        return namespace['calculator'], namespace['typed_calculator']
+
+    def _build_level_calculator(self, graph: 'Graph', compiled_nodes: Dict[str, Callable]) -> Callable:
+        '''
+        Внутренний метод: создает калькулятор, выполняющий граф по уровням.
+
+        Args:
+        graph: Объект Graph
+        compiled_nodes: Словарь {node_id: compiled_function}, полученный из _compile_nodes
+
+        Returns:
+        Функция calculator(input_values) -> outputs
+
+        Note:
+        Вычислительные узлы уровня отправляются в общий ThreadPoolExecutor,
+        если их больше одного; иначе узел вызывается напрямую, чтобы не платить
+        за накладные расходы пула. Узлы, чья функция объявляет release_gil = False
+        (чистый Python, держит GIL), всегда вызываются напрямую в основном потоке -
+        после отправки задач уровня в пул, чтобы выполняться одновременно с ними.
+        Результаты всех узлов уровня записываются в values и results только после
+        завершения всего уровня, поэтому блокировки не нужны.
+        Тип узла разбирается на этапе компиляции: входные, выходные и одиночные
+        вычислительные узлы превращаются в обработчики create_node_handler
+        '''
+        node_count = len(graph.sort)
+        index = {node_id: i for i, node_id in enumerate(graph.sort)}
+        levels = []
+        done = 0
+
+        for level in graph.layers:
+            progress = []
+            handlers = []
+            output_handlers = []
+            tasks = []
+
+            for node_id in level:
+                done += 1
+                progress.append((done / node_count, node_id))
+
+                node = graph.nodes[node_id]
+                node_func = compiled_nodes[node_id]
+                if node.type == 'out':
+                    output_handlers.append((node.uid, create_node_handler(node, node_func)))
+                elif (
+                    node.type == 'in'
+                    or getattr(self.nodes_pool.get(node.uid), 'release_gil', True) is False
+                ):
+                    handlers.append((node_id, index[node_id], create_node_handler(node, node_func)))
+                else:
+                    tasks.append((node, index[node_id], node_func))
+
+            # Одиночный вычислительный узел выполняется без пула
+            if len(tasks) == 1:
+                node, i, node_func = tasks[0]
+                handlers.append((node.id, i, create_node_handler(node, node_func)))
+                tasks = []
+
+            tasks = tuple((node.id, i, node_func) for node, i, node_func in tasks)
+            levels.append((tuple(progress), tuple(handlers), tasks, tuple(output_handlers)))
+
         def calculator(input_values: Dict[str, Any]) -> Dict[str, Any]:
+            updater = self.updater
+            values = [None] * node_count
             results = {}
             outputs = {}
 
-            for i, (node_id, node, node_func) in enumerate(node_list, 1):
-                if self.updater:
-                    self.updater(i / node_count, node_id)
+            for progress, handlers, tasks, output_handlers in levels:
+                if updater:
+                    for fraction, node_id in progress:
+                        updater(fraction, node_id)
 
-                if node.type == 'in':
-                    result = node_func(input_values)
-                else:
-                    result = node_func(results)
+                futures = ()
+                if tasks:
+                    executor = self._get_executor()
+                    futures = [
+                        (node_id, i, executor.submit(node_func, values, results))
+                        for node_id, i, node_func in tasks
+                    ]
 
-                if node.type == 'out':
-                    outputs[node.uid] = result
-                else:
-                    results[node_id] = result
+                # Узлы основного потока выполняются, пока пул занят задачами уровня
+                computed = [
+                    (node_id, i, handler(input_values, values, results))
+                    for node_id, i, handler in handlers
+                ]
+                computed += [(node_id, i, future.result()) for node_id, i, future in futures]
+
+                for node_id, i, value in computed:
+                    values[i] = results[node_id] = value
+
+                for uid, handler in output_handlers:
+                    outputs[uid] = handler(input_values, values, results)
 
             return outputs
 
-        return CompiledGraph(
-            calculator=calculator,
-            input_ids=graph.input_ids,
-            output_ids=graph.output_ids
-        )
+        return calculator
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        '''
+        Внутренний метод: возвращает общий пул потоков компилятора, создавая его при первом обращении.
+        Создание защищено блокировкой, чтобы параллельные вызовы калькуляторов не создали два пула
+        '''
+        executor = self._executor
+        if executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+                executor = self._executor
+        return executor
+
+    def close(self) -> None:
+        '''
+        Останавливает пул потоков компилятора, если он был создан.
+
+        Note:
+        Калькуляторы, созданные этим компилятором, остаются рабочими:
+        при следующем параллельном выполнении пул будет создан заново
+        '''
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+
+    def __enter__(self) -> 'GraphCompiler':
+        return self
 
-    def _compile_nodes(self, graph: 'Graph') -> Dict[str, Callable]:
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _compile_nodes(
+        self,
+        graph: 'Graph',
+        memo: Optional[Dict[str, OrderedDict]] = None
+    ) -> Dict[str, Callable]:
         '''
         Внутренний метод: компилирует все узлы графа.
 
         Args:
         graph: Объект Graph
+        memo: Словарь для кэшей мемоизации. Если передан, для каждого
+        вычислительного узла в нем создается свой кэш
 
         Returns:
-        Словарь {node_id: compiled_function} для всех узлов графа
+        Словарь {node_id: compiled_function} для всех узлов графа.
+        Функции читают результаты предыдущих узлов из списка values
+        по их позиции в топологическом порядке
 
         Node types:
         - 'in': Создается функция ввода (create_input_node_func)
@@ -178,6 +937,12 @@ class GraphCompiler:
         - другие: Создается вычислительная функция (_create_computation_node_func)
         '''
         compiled_nodes = {}
+        index = {node_id: i for i, node_id in enumerate(graph.sort)}
+        plain_sources, _ = self._classify_sources(graph)
+        constants = self._fold_constants(graph) if self.fold_constants else {}
+        plain_sources |= {
+            node_id for node_id, value in constants.items() if not isinstance(value, dict)
+        }
 
         for node in graph:
             input_sources = graph.inputs.get(node.id, {})
@@ -186,23 +951,151 @@ class GraphCompiler:
                 compiled_nodes[node.id] = create_input_node_func(node)
 
             elif node.type == 'out':
-                compiled_nodes[node.id] = create_output_node_func(input_sources)
+                compiled_nodes[node.id] = create_output_node_func(input_sources, index)
+
+            elif node.id in constants:
+                compiled_nodes[node.id] = create_constant_node_func(constants[node.id])
 
             else:
-                compiled_nodes[node.id] = self._create_computation_node_func(
+                check_kernel_slots(node, self.nodes_pool[node.uid], input_sources)
+                node_func = self._create_computation_node_func(
                     node,
-                    input_sources
+                    self._get_node_func(node, memo),
+                    input_sources,
+                    index,
+                    plain_sources
                 )
+                if self.debug:
+                    node_func = create_debug_node_func(node, node_func)
+
+                compiled_nodes[node.id] = node_func
 
         return compiled_nodes
 
-    def _create_computation_node_func(self, node, input_sources: Dict[str, tuple]) -> Callable:
+    def _fold_constants(self, graph: 'Graph') -> Dict[str, Any]:
+        '''
+        Внутренний метод: вычисляет узлы, не зависящие от входов графа.
+
+        Args:
+        graph: Объект Graph
+
+        Returns:
+        Словарь {node_id: результат} для вычислительных узлов, все источники которых
+        (транзитивно) тоже свернуты: узлы без входов и их потомки, не зависящие
+        ни от одного входного узла
+
+        Note:
+        Функции узлов вызываются один раз при компиляции с той же сигнатурой,
+        что и при выполнении; в results передаются только свернутые узлы.
+        Ошибка узла при debug=True оборачивается make_node_error
+        '''
+        constants = {}
+
+        for node in graph:
+            if node.type in ('in', 'out'):
+                continue
+
+            input_sources = graph.inputs.get(node.id, {})
+            if not all(source_id in constants for source_id, _ in input_sources.values()):
+                continue
+
+            node_inputs = {}
+            for slot, (source_id, source_output) in input_sources.items():
+                value = constants[source_id]
+                node_inputs[slot] = value[source_output] if isinstance(value, dict) else value
+
+            node_func = self.nodes_pool[node.uid]
+            check_kernel_slots(node, node_func, input_sources)
+            kernel_slots = getattr(node_func, 'input_slots', None)
+            try:
+                if kernel_slots is not None:
+                    value = node_func(*(node_inputs[slot] for slot in kernel_slots))
+                else:
+                    value = node_func(node=node, node_inputs=node_inputs, results=constants)
+            except Exception as error:
+                if self.debug:
+                    raise make_node_error(node, error) from error
+                raise
+
+            constants[node.id] = value
+
+        return constants
+
+    def _classify_sources(self, graph: 'Graph') -> Tuple[Set[str], Set[str]]:
+        '''
+        Внутренний метод: статически определяет, какие узлы возвращают словарь.
+
+        Args:
+        graph: Объект Graph
+
+        Returns:
+        Кортеж (plain_sources, dict_sources):
+        - plain_sources: узлы, которые никогда не возвращают словарь -
+          входные узлы и узлы, чья функция в nodes_pool объявляет returns_dict = False
+        - dict_sources: узлы, чья функция объявляет returns_dict = True
+
+        Note:
+        Для остальных узлов тип результата неизвестен, и при чтении их выхода
+        выполняется проверка isinstance(value, dict)
+        '''
+        plain_sources = set()
+        dict_sources = set()
+
+        for node in graph:
+            if node.type == 'in':
+                plain_sources.add(node.id)
+            elif node.type != 'out':
+                returns_dict = getattr(self.nodes_pool.get(node.uid), 'returns_dict', None)
+                if returns_dict is True:
+                    dict_sources.add(node.id)
+                elif returns_dict is False:
+                    plain_sources.add(node.id)
+
+        return plain_sources, dict_sources
+
+    def _get_node_func(self, node, memo: Optional[Dict[str, OrderedDict]] = None) -> Callable:
+        '''
+        Внутренний метод: возвращает функцию узла из nodes_pool.
+
+        Args:
+        node: Объект вычислительного узла
+        memo: Словарь для кэшей мемоизации. Если передан и мемоизация включена
+        для узла (enable_memoization или data['memoize']), в нем создается
+        кэш узла, а функция оборачивается create_memoized_func
+
+        Returns:
+        Функция с сигнатурой func(node, node_inputs, results) -> Any
+        или функция-ядро с атрибутом input_slots (см. create_kernel_adapter).
+        При мемоизации ядро приводится к обычной сигнатуре
+        '''
+        node_func = self.nodes_pool[node.uid]
+        if memo is not None and (self.enable_memoization or node.data.get('memoize')):
+            kernel_slots = getattr(node_func, 'input_slots', None)
+            if kernel_slots is not None:
+                node_func = create_kernel_adapter(node_func, kernel_slots)
+
+            cache = memo[node.id] = OrderedDict()
+            node_func = create_memoized_func(node_func, cache, self.memo_size)
+        return node_func
+
+    def _create_computation_node_func(
+        self,
+        node,
+        node_func: Callable,
+        input_sources: Dict[str, tuple],
+        index: Dict[str, int],
+        plain_sources: Set[str] = frozenset()
+    ) -> Callable:
         '''
         Создает функцию для вычислительного узла.
 
         Args:
         node: Объект узла
+        node_func: Функция узла, полученная из _get_node_func
         input_sources: Словарь входных соединений узла
+        index: Позиции узлов в списке values {node_id: position}
+        plain_sources: ID узлов, которые гарантированно не возвращают словарь
+        (например, входные узлы). Для них проверка isinstance не нужна
 
         Returns:
         Функция, которая:
@@ -213,18 +1106,54 @@ class GraphCompiler:
 
         Note:
         Поддерживает извлечение значений из вложенных словарей, когда
-        предыдущий узел возвращает несколько выходов
-        '''       
-        node_func = self.nodes_pool[node.uid]
-        slots = dict(input_sources)
-
-        def computation_func(results: Dict[str, Any]) -> Any:
-            inputs = {}
-            for slot, (source_id, source_output) in slots.items():
-                value = results[source_id]
-                if isinstance(value, dict):
-                    value = value[source_output]
-                inputs[slot] = value
+        предыдущий узел возвращает несколько выходов.
+        Слоты фиксируются в кортеже на этапе компиляции. Если все источники
+        из plain_sources, возвращается упрощенный вариант без проверки
+        isinstance. В обоих вариантах входы собираются одним dict-comprehension,
+        без поэлементного наращивания словаря
+        '''
+        kernel_slots = getattr(node_func, 'input_slots', None)
+        if kernel_slots is not None:
+            args = tuple(
+                (index[source_id], source_output)
+                for source_id, source_output in (input_sources[slot] for slot in kernel_slots)
+            )
+
+            def kernel_computation_func(values: List[Any], results: Dict[str, Any]) -> Any:
+                return node_func(*[
+                    value[source_output] if isinstance(value, dict) else value
+                    for source_index, source_output in args
+                    for value in [values[source_index]]
+                ])
+
+            return kernel_computation_func
+
+        slots = tuple(
+            (slot, index[source_id], source_output)
+            for slot, (source_id, source_output) in input_sources.items()
+        )
+
+        if all(source_id in plain_sources for source_id, _ in input_sources.values()):
+            direct_slots = tuple((slot, source_index) for slot, source_index, _ in slots)
+
+            def direct_computation_func(values: List[Any], results: Dict[str, Any]) -> Any:
+                return node_func(
+                    node=node,
+                    node_inputs={slot: values[source_index] for slot, source_index in direct_slots},
+                    results=results
+                )
+
+            return direct_computation_func
+
+        def computation_func(values: List[Any], results: Dict[str, Any]) -> Any:
+            # for value in [...] - присваивание внутри comprehension без оператора :=,
+            # который требует Python 3.8; начиная с 3.9 CPython компилирует его
+            # как обычное присваивание
+            inputs = {
+                slot: value[source_output] if isinstance(value, dict) else value
+                for slot, source_index, source_output in slots
+                for value in [values[source_index]]
+            }
 
             return node_func(
                 node=node,
@@ -1,15 +1,20 @@
 from typing import Dict, Any
+import logging
 import numpy as np
 from graph import Graph
 from compiler import GraphCompiler
 
 
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+log = logging.getLogger(__name__)
+
 
 def add_node(node, node_inputs: Dict, results: Dict) -> Any:
     a = node_inputs['a']
     b = node_inputs['b']
     result = a + b
-    print(f'        add: {a} + {b} = {result}')
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug('        add: %s + %s = %s', a, b, result)
     return result
 
 
@@ -19,7 +24,8 @@ def split_node(node, node_inputs: Dict, results: Dict) -> Dict[str, Any]:
         'double': x * 2,
         'square': x ** 2
     }
-    print(f'        split: {x} → {result}')
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug('        split: %s → %s', x, result)
     return result
 
 
@@ -27,7 +33,8 @@ def multiply_node(node, node_inputs: Dict, results: Dict) -> Any:
     x = node_inputs['x']
     y = node_inputs['y']
     result = x * y
-    print(f'        multiply: {x} * {y} = {result}')
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug('        multiply: %s * %s = %s', x, y, result)
     return result
 
 
@@ -69,10 +76,12 @@ graph = Graph(graph_data)
 
 
 def update(progress, uid):
-    print(f'    {progress * 100:.1f}% → {uid}')
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug('    %.1f%% → %s', progress * 100, uid)
 
 
-compiler = GraphCompiler(nodes_pool, update)
+# Без обработчика прогресса компилятор строит вариант вычислителя без вызовов updater
+compiler = GraphCompiler(nodes_pool, update if log.isEnabledFor(logging.DEBUG) else None)
 compiled = compiler.compile(graph)
 
 
@@ -1,110 +1,102 @@
-from typing import Dict, Any, Set, Iterator, Optional, List
-from collections import defaultdict, deque
+from typing import Dict, Any, Iterator, Iterable, Optional, List, Tuple, Hashable
+import sys
+import threading
+from collections import defaultdict, OrderedDict
 from dataclasses import dataclass, field
 
 
-def build_reverse_graph(connections: List[Dict[str, Any]]) -> Dict[str, Set[str]]:
+def get_node_index(index: Dict[str, int], adjacency: List[List[int]], node_id: str) -> int:
     '''
-    Строит обратный граф (target → sources) для обхода в ширину.
+    Возвращает целочисленный индекс узла, при необходимости регистрируя новый.
 
     Args:
-    connections: Список соединений, где каждое соединение содержит ключи 'source' и 'target'
+    index: Таблица {node_id: int}, дополняется на месте
+    adjacency: Список смежности, индексируемый номерами узлов.
+    Для нового узла в него добавляется пустой список
 
     Returns:
-    Словарь, где ключ - ID целевого узла, значение - множество ID исходных узлов
+    Индекс узла
     '''
-    reverse_graph = defaultdict(set)
-    for conn in connections:
-        reverse_graph[conn['target']].add(conn['source'])
-    return reverse_graph
+    i = index.get(node_id)
+    if i is None:
+        i = index[node_id] = len(adjacency)
+        adjacency.append([])
+    return i
 
 
-def find_reachable_nodes(start_nodes: Set[str], reverse_graph: Dict[str, Set[str]]) -> Set[str]:
+def find_reachable_nodes(start_nodes: Iterable[int], reverse_graph: List[List[int]]) -> bytearray:
     '''
     Находит все узлы, достижимые из начальных узлов через обратный граф.
 
     Args:
-    start_nodes: Множество начальных узлов (обычно выходные узлы графа)
-    reverse_graph: Обратный граф, построенный функцией build_reverse_graph
+    start_nodes: Индексы начальных узлов (обычно выходные узлы графа)
+    reverse_graph: Обратный граф (target → sources) в виде списка смежности по индексам
 
     Returns:
-    Множество ID всех узлов, достижимых из start_nodes
-    '''
-    visited = set()
-    queue = deque(start_nodes)
+    Битовая карта длиной len(reverse_graph): 1 для узлов, достижимых из start_nodes
 
-    while queue:
-        node_id = queue.popleft()
-        if node_id in visited:
-            continue
-        visited.add(node_id)
-        queue.extend(reverse_graph.get(node_id, set()) - visited)
+    Note:
+    Узел помечается при постановке в очередь, поэтому каждый узел попадает
+    в очередь ровно один раз и промежуточные множества не создаются.
+    Обход прекращается, как только помечены все узлы графа
+    '''
+    node_count = len(reverse_graph)
+    visited = bytearray(node_count)
+    # Очередь - обычный список с курсором head: узлы только дописываются в конец
+    queue = []
+
+    for node in start_nodes:
+        if not visited[node]:
+            visited[node] = 1
+            queue.append(node)
+
+    head = 0
+    while head < len(queue) and len(queue) < node_count:
+        for source in reverse_graph[queue[head]]:
+            if not visited[source]:
+                visited[source] = 1
+                queue.append(source)
+        head += 1
 
     return visited
 
 
-def process_variable_nodes(json_data: Dict[str, Any]) -> Dict[str, Any]:
+def find_variable_groups(nodes: List[Dict[str, Any]]) -> List[Tuple[str, List[str]]]:
     '''
-    Обрабатывает variable-ноды, заменяя их реальными соединениями.
-
-    Variable-ноды группируются по label. Для каждой группы:
-    1. Находим input-ноду (is_input=True) и output-ноды (is_input=False)
-    2. Создаем прямые соединения от источников input-ноды к целям output-нод
-    3. Удаляем старые соединения через variable-ноды
+    Группирует variable-ноды по label.
 
     Args:
-    json_data: Граф с variable-нодами в формате {'nodes': [...], 'connections': [...]}
+    nodes: Список узлов графа
 
     Returns:
-    Оптимизированный граф без variable-нод
+    Список пар (ID input-ноды, [ID output-нод]) для каждой группы, в которой есть
+    input-нода (is_input=True) и хотя бы одна output-нода (is_input=False).
+    Если input-нод несколько, берется первая
     '''
-    variable_nodes = [n for n in json_data['nodes'] if n.get('type') == 'variable']
-
+    # data каждой variable-ноды читается один раз: в группы попадают только
+    # пары (id, is_input), а не сами словари узлов
     groups = defaultdict(list)
-    for node in variable_nodes:
-        label = node.get('data', {}).get('label')
-        if label:
-            groups[label].append(node)
-
-    by_target = defaultdict(list)
-    by_source = defaultdict(list)
-
-    for conn in json_data['connections']:
-        by_target[conn['target']].append(conn)
-        by_source[conn['source']].append(conn)
-
-    new_connections = []
-    to_remove = set()
-
-    for nodes in groups.values():
-        input_node = next((n for n in nodes if n.get('data', {}).get('is_input')), None)
-        output_nodes = [n for n in nodes if not n.get('data', {}).get('is_input')]
-
-        if not input_node or not output_nodes:
-            continue
+    for node in nodes:
+        if node.get('type') == 'variable':
+            data = node.get('data') or {}
+            label = data.get('label')
+            if label:
+                groups[label].append((node['id'], data.get('is_input')))
 
-        input_conns = by_target.get(input_node['id'], [])
+    resolved = []
+    for group in groups.values():
+        input_id = None
+        output_ids = []
+        for node_id, is_input in group:
+            if not is_input:
+                output_ids.append(node_id)
+            elif input_id is None:
+                input_id = node_id
 
-        for out_node in output_nodes:
-            output_conns = by_source.get(out_node['id'], [])
+        if input_id is not None and output_ids:
+            resolved.append((input_id, output_ids))
 
-            for ic in input_conns:
-                for oc in output_conns:
-                    new_connections.append({
-                        'source': ic['source'],
-                        'target': oc['target'],
-                        'targetInput': oc['targetInput']
-                    })
-
-            to_remove.update(map(id, input_conns))
-            to_remove.update(map(id, output_conns))
-
-    json_data['connections'] = [
-        c for c in json_data['connections'] if id(c) not in to_remove
-    ]
-    json_data['connections'].extend(new_connections)
-
-    return json_data
+    return resolved
 
 
 def optimize_graph(json_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -112,73 +104,272 @@ def optimize_graph(json_data: Dict[str, Any]) -> Dict[str, Any]:
     Оптимизирует граф: удаляет variable-ноды и недостижимые узлы.
 
     Процесс оптимизации:
-    1. Удаление variable-нод (process_variable_nodes)
-    2. Построение обратного графа от выходных узлов
-    3. Поиск достижимых узлов
-    4. Удаление недостижимых узлов и соединений
+    1. Группировка variable-нод (find_variable_groups)
+    2. Один проход по соединениям: соединения через variable-ноды откладываются,
+       остальные сохраняются и сразу попадают в обратный граф
+    3. Создание прямых соединений от источника input-ноды к целям output-нод.
+       У input-ноды один источник; если соединений несколько, действует последнее.
+       Выход источника (sourceOutput) переносится в новые соединения.
+       На каждый вход получателя остается одно соединение - последнее
+    4. Поиск узлов, достижимых от выходных узлов
+    5. Удаление недостижимых узлов и соединений
 
     Args:
     json_data: Исходный граф для оптимизации
 
     Returns:
-    Оптимизированный граф только с достижимыми узлами
-    '''    
-    json_data = process_variable_nodes(json_data)
+    Оптимизированный граф только с достижимыми узлами.
+    Исходный json_data не изменяется
+    '''
+    groups = find_variable_groups(json_data['nodes'])
+    variable_inputs = {input_id for input_id, _ in groups}
+    variable_outputs = {output_id for _, output_ids in groups for output_id in output_ids}
+
+    index = {}
+    reverse_graph = []
+    for n in json_data['nodes']:
+        get_node_index(index, reverse_graph, n['id'])
+
+    variable_sources = {}
+    outgoing = defaultdict(list)
+    # Сохраненные соединения хранятся параллельными списками (соединение,
+    # индекс источника, индекс получателя) без кортежа на каждое ребро
+    kept = []
+    kept_sources = []
+    kept_targets = []
 
-    output_nodes = {
-        n['id'] for n in json_data['nodes'] if n.get('type') == 'out'
-    }
+    for conn in json_data['connections']:
+        source = conn['source']
+        target = conn['target']
+        through_variable = False
+
+        if target in variable_inputs:
+            variable_sources[target] = conn
+            through_variable = True
+        if source in variable_outputs:
+            outgoing[source].append(conn)
+            through_variable = True
+
+        if not through_variable:
+            source_index = get_node_index(index, reverse_graph, source)
+            target_index = get_node_index(index, reverse_graph, target)
+            kept.append(conn)
+            kept_sources.append(source_index)
+            kept_targets.append(target_index)
+            reverse_graph[target_index].append(source_index)
+
+    # Прямые соединения собираются по ключу (target, targetInput): вход получателя
+    # принимает одно значение, поэтому повторное соединение в тот же вход
+    # заменяет предыдущее, как и при построении Graph.inputs
+    expanded = {}
+    for input_id, output_ids in groups:
+        ic = variable_sources.get(input_id)
+        if ic is None:
+            continue
 
-    reverse_graph = build_reverse_graph(json_data['connections'])
+        for output_id in output_ids:
+            for oc in outgoing[output_id]:
+                conn = {
+                    'source': ic['source'],
+                    'target': oc['target'],
+                    'targetInput': oc['targetInput']
+                }
+                if 'sourceOutput' in ic:
+                    conn['sourceOutput'] = ic['sourceOutput']
+                expanded[oc['target'], oc['targetInput']] = conn
+
+    for conn in expanded.values():
+        source_index = get_node_index(index, reverse_graph, conn['source'])
+        target_index = get_node_index(index, reverse_graph, conn['target'])
+        kept.append(conn)
+        kept_sources.append(source_index)
+        kept_targets.append(target_index)
+        reverse_graph[target_index].append(source_index)
+
+    output_nodes = [
+        index[n['id']] for n in json_data['nodes'] if n.get('type') == 'out'
+    ]
     used_nodes = find_reachable_nodes(output_nodes, reverse_graph)
 
     return {
-        'nodes': [n for n in json_data['nodes'] if n['id'] in used_nodes],
+        'nodes': [n for n in json_data['nodes'] if used_nodes[index[n['id']]]],
         'connections': [
-            c for c in json_data['connections']
-            if c['source'] in used_nodes and c['target'] in used_nodes
+            conn for conn, source_index, target_index in zip(kept, kept_sources, kept_targets)
+            if used_nodes[source_index] and used_nodes[target_index]
         ]
     }
 
 
-def topological_sort(
-    nodes: Dict[str, Any],
-    inputs: Dict[str, Dict[str, str]],
-    outputs: Dict[str, Dict[str, Set[str]]]
-) -> List[str]:
+def topological_layers(in_degree: List[int], out_adj: List[List[int]]) -> List[List[int]]:
+    '''
+    Выполняет топологическую сортировку графа по уровням (алгоритм Кана по волнам).
+
+    Args:
+    in_degree: Число входов каждого узла по его индексу. Изменяется на месте
+    out_adj: Список смежности по индексам: out_adj[source] - индексы узлов-получателей,
+    по одному на каждое соединение
+
+    Returns:
+    Список уровней - списков индексов узлов. Узлы одного уровня не зависят друг
+    от друга, все зависимости узла находятся на предыдущих уровнях (номер уровня -
+    длина самого длинного пути от узла без входов).
+    Узлы, входящие в цикл или зависящие от отсутствующих узлов, в него не попадают
+    '''
+    # Узлы без входов (обычно большая часть разреженного графа) составляют
+    # первый уровень и собираются одним проходом
+    layer = [node for node, d in enumerate(in_degree) if d == 0]
+    layers = []
+
+    while layer:
+        layers.append(layer)
+        next_layer = []
+
+        for node in layer:
+            for target in out_adj[node]:
+                in_degree[target] -= 1
+                if in_degree[target] == 0:
+                    next_layer.append(target)
+
+        layer = next_layer
+
+    return layers
+
+
+def topological_sort(in_degree: List[int], out_adj: List[List[int]]) -> List[int]:
     '''
     Выполняет топологическую сортировку графа (алгоритм Кана).
 
     Args:
-    nodes: Словарь всех узлов {node_id: node_data}
-    inputs: Словарь входных соединений {target_id: {input_slot: source_id}}
-    outputs: Словарь выходных соединений {source_id: {output_slot: {target_ids}}}
+    in_degree: Число входов каждого узла по его индексу. Изменяется на месте
+    out_adj: Список смежности по индексам (см. topological_layers)
 
     Returns:
-    Список ID узлов в топологическом порядке (от входов к выходам)
+    Список индексов узлов в топологическом порядке (от входов к выходам) -
+    уровни topological_layers подряд. Это тот же порядок, что дает Кан
+    с очередью FIFO: узел становится готовым при обработке последнего
+    из своих источников, то есть на следующей волне после него
+    '''
+    return [node for layer in topological_layers(in_degree, out_adj) for node in layer]
+
+
+def freeze_value(value: Any) -> Hashable:
     '''
-    in_degree = {node_id: 0 for node_id in nodes}
+    Рекурсивно приводит значение из JSON к хешируемому виду.
 
-    for target, slots in inputs.items():
-        in_degree[target] = len(slots)
+    Args:
+    value: Значение (словарь, список, скаляр)
 
-    queue = deque(node_id for node_id, d in in_degree.items() if d == 0)
-    order = []
+    Returns:
+    Пара (тип, значение): словари превращаются в отсортированные по ключу кортежи пар,
+    списки и кортежи - в кортежи. Тип входит в результат, чтобы равные, но разные
+    по типу значения (2 и 2.0, True и 1, [1] и (1,)) давали разные ключи.
+    Если значение не удается сделать хешируемым или ключи словаря несравнимы,
+    выбрасывается TypeError
+    '''
+    if isinstance(value, dict):
+        return (type(value), tuple(
+            (freeze_value(key), freeze_value(item))
+            for key, item in sorted(value.items(), key=lambda pair: pair[0])
+        ))
+    if isinstance(value, (list, tuple)):
+        return (type(value), tuple(freeze_value(item) for item in value))
+    hash(value)
+    return (type(value), value)
 
-    while queue:
-        node_id = queue.popleft()
-        order.append(node_id)
 
-        for targets in outputs.get(node_id, {}).values():
-            for target_id in targets:
-                in_degree[target_id] -= 1
-                if in_degree[target_id] == 0:
-                    queue.append(target_id)
+_MISSING = object()
+'''Маркер отсутствующего поля соединения в skeleton_key'''
 
-    return order
 
+def skeleton_key(json_data: Dict[str, Any]) -> Optional[Hashable]:
+    '''
+    Строит ключ структуры графа без данных узлов.
 
-@dataclass
+    Args:
+    json_data: Граф в формате {'nodes': [...], 'connections': [...]}
+
+    Returns:
+    Хешируемый ключ из (id, type, uid) узлов, label/is_input variable-нод и
+    (source, sourceOutput, target, targetInput) соединений в исходном порядке.
+    Отсутствующий sourceOutput и sourceOutput=None дают разные ключи.
+    От него зависят результаты optimize_graph и топологической сортировки.
+    None, если какое-либо из этих полей нехешируемо
+    '''
+    nodes = []
+    for n in json_data['nodes']:
+        node_type = n.get('type')
+        if node_type == 'variable':
+            data = n.get('data') or {}
+            nodes.append((n['id'], node_type, n.get('uid'), data.get('label'), bool(data.get('is_input'))))
+        else:
+            nodes.append((n['id'], node_type, n.get('uid')))
+
+    key = (
+        tuple(nodes),
+        tuple(
+            (c['source'], c.get('sourceOutput', _MISSING), c['target'], c['targetInput'])
+            for c in json_data['connections']
+        )
+    )
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+class SkeletonCache:
+    '''
+    LRU-кэш скелетов графов - результатов оптимизации и сортировки (см. Graph).
+    Создается явно и передается в Graph; безопасен для использования из нескольких потоков
+    '''
+
+    def __init__(self, max_size: int = 64):
+        '''
+        Инициализирует кэш.
+
+        Args:
+        max_size: Максимальное число хранимых скелетов
+        '''
+        self.max_size = max_size
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[tuple]:
+        '''
+        Возвращает скелет по ключу skeleton_key или None.
+
+        Returns:
+        Кортеж (позиции узлов, соединения, уровни узлов)
+        '''
+        with self._lock:
+            skeleton = self._entries.get(key)
+            if skeleton is not None:
+                self._entries.move_to_end(key)
+            return skeleton
+
+    def put(self, key: Hashable, skeleton: tuple) -> None:
+        '''
+        Сохраняет скелет, вытесняя самый давно использованный при переполнении.
+        '''
+        with self._lock:
+            self._entries[key] = skeleton
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        '''Удаляет все скелеты из кэша'''
+        with self._lock:
+            self._entries.clear()
+
+
+# Узлы без __dict__ (slots) занимают меньше памяти и быстрее читают атрибуты;
+# параметр slots у dataclass появился в Python 3.10
+SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+
+@dataclass(**SLOTS)
 class Node:
     id: str
     uid: Optional[str] = None
@@ -189,66 +380,167 @@ class Node:
 class Graph:
     '''Класс графа вычислений - хранит состояние графа'''
 
-    def __init__(self, json_data: Dict[str, Any]):
+    def __init__(self, json_data: Dict[str, Any], skeleton_cache: Optional[SkeletonCache] = None):
         '''
         Инициализирует граф из JSON данных.
         Процесс инициализации:
         1. Оптимизация графа (удаление variable-нод и недостижимых узлов)
-        2. Создание объектов Node для каждого узла
+        2. Создание объектов Node для каждого узла и, в том же проходе,
+           сбор UID входных и выходных узлов
         3. Построение структур inputs/outputs
-        4. Топологическая сортировка
-        5. Извлечение ID входных и выходных узлов
+        4. Топологическая сортировка: layers - уровни независимых узлов,
+           sort - те же узлы одним списком
 
         Args:
         json_data: Граф в формате {'nodes': [...], 'connections': [...]}
-        '''
-        self.json_data = optimize_graph(json_data)
+        skeleton_cache: Опциональный кэш скелетов. Если передан, результаты
+        шагов 1 и 4 кэшируются в нем по skeleton_key
 
-        self.nodes = {
-            n['id']: Node(
+        Note:
+        Для графа той же структуры, отличающегося только data узлов, при попадании
+        в skeleton_cache оптимизация и сортировка не выполняются: узлы и соединения
+        берутся из нового json_data по сохраненным позициям
+        '''
+        key = skeleton_key(json_data) if skeleton_cache is not None else None
+        skeleton = skeleton_cache.get(key) if key is not None else None
+
+        if skeleton is not None:
+            node_positions, connection_refs, layers = skeleton
+            nodes = json_data['nodes']
+            connections = json_data['connections']
+            self.json_data = {
+                'nodes': [nodes[i] for i in node_positions],
+                'connections': [
+                    connections[ref] if isinstance(ref, int) else dict(ref)
+                    for ref in connection_refs
+                ]
+            }
+        else:
+            self.json_data = optimize_graph(json_data)
+
+        self.nodes = {}
+        self.input_ids = []
+        self.output_ids = []
+
+        for n in self.json_data['nodes']:
+            node_type = n.get('type')
+            self.nodes[n['id']] = Node(
                 id=n['id'],
                 uid=n.get('uid'),
-                type=n.get('type'),
+                type=node_type,
                 data=n.get('data', {})
             )
-            for n in self.json_data['nodes']
-        }
 
-        self.inputs = defaultdict(dict)
-        self.outputs = defaultdict(lambda: defaultdict(set))
+            if node_type == 'in':
+                self.input_ids.append(n['uid'])
+            elif node_type == 'out':
+                self.output_ids.append(n['uid'])
+
+        self.inputs = {}
+        self.outputs = {}
 
         for conn in self.json_data['connections']:
             source = conn['source']
             target = conn['target']
-            input_slot = conn['targetInput']
-            output_slot = conn.get('sourceOutput', 'default')
-
             source_output = conn.get('sourceOutput', 'default')
-            self.inputs[target][input_slot] = (source, source_output)
-            self.outputs[source][output_slot].add(target)
 
-        self.sort = topological_sort(self.nodes, self.inputs, self.outputs)
-        self.input_ids = self._extract_input_ids()
-        self.output_ids = self._extract_output_ids()
+            self.inputs.setdefault(target, {})[conn['targetInput']] = (source, source_output)
+            self.outputs.setdefault(source, {}).setdefault(source_output, set()).add(target)
 
-    def __iter__(self) -> Iterator[Node]:
-        for node_id in self.sort:
-            yield self.nodes[node_id]
+        self._id_index = {node_id: i for i, node_id in enumerate(self.nodes)}
+
+        if skeleton is not None:
+            self.layers = [list(layer) for layer in layers]
+        else:
+            self.layers = self._sort_nodes()
+        self.sort = [node_id for layer in self.layers for node_id in layer]
+
+        if skeleton is None and key is not None:
+            skeleton_cache.put(key, self._build_skeleton(json_data))
+
+        # Узлы в топологическом порядке: компилятор обходит граф несколько раз,
+        # и обход не должен искать каждый узел в self.nodes по ID
+        self._sorted_nodes = [self.nodes[node_id] for node_id in self.sort]
+
+    def _sort_nodes(self) -> List[List[str]]:
+        '''
+        Внутренний метод: топологически сортирует узлы графа по уровням.
+
+        Returns:
+        Список уровней - списков ID узлов (см. topological_layers)
+
+        Note:
+        Сортировка работает с целочисленными индексами узлов вместо строковых ID
+        '''
+        node_ids = list(self.nodes)
+        in_degree = [0] * len(node_ids)
+        out_adj = [[] for _ in node_ids]
 
-    def _extract_input_ids(self) -> List[str]:
+        for target, slots in self.inputs.items():
+            target_index = self._id_index.get(target)
+            if target_index is None:
+                continue
+
+            in_degree[target_index] = len(slots)
+            for source, _ in slots.values():
+                source_index = self._id_index.get(source)
+                if source_index is not None:
+                    out_adj[source_index].append(target_index)
+
+        return [[node_ids[i] for i in layer] for layer in topological_layers(in_degree, out_adj)]
+
+    def _build_skeleton(self, json_data: Dict[str, Any]) -> tuple:
         '''
-        Извлекает UID всех входных узлов (type='in').
+        Внутренний метод: строит скелет графа для SkeletonCache.
+
+        Args:
+        json_data: Исходный граф, переданный в __init__
 
         Returns:
-        Список UID входных узлов
+        Кортеж (позиции узлов, соединения, уровни узлов)
+
+        Note:
+        Узлы и исходные соединения запоминаются позициями в json_data,
+        а соединения, созданные при удалении variable-нод, - копиями
         '''
-        return [n['uid'] for n in self.json_data['nodes'] if n.get('type') == 'in']
+        node_positions = {id(n): i for i, n in enumerate(json_data['nodes'])}
+        connection_positions = {id(c): i for i, c in enumerate(json_data['connections'])}
+
+        return (
+            tuple(node_positions[id(n)] for n in self.json_data['nodes']),
+            tuple(
+                connection_positions[id(c)] if id(c) in connection_positions else dict(c)
+                for c in self.json_data['connections']
+            ),
+            tuple(tuple(layer) for layer in self.layers)
+        )
 
-    def _extract_output_ids(self) -> List[str]:
+    def __iter__(self) -> Iterator[Node]:
+        return iter(self._sorted_nodes)
+
+    def structure_key(self) -> Optional[Hashable]:
         '''
-        Извлекает UID всех выходных узлов (type='out').
+        Строит структурный ключ графа: узлы в топологическом порядке
+        (id, uid, type, data) и все входные соединения.
 
         Returns:
-        Список UID выходных узлов
+        Хешируемый ключ; два графа с равными ключами компилируются одинаково.
+        None, если data какого-либо узла содержит нехешируемые значения
+        или ID получателей нельзя упорядочить
         '''
-        return [n['uid'] for n in self.json_data['nodes'] if n.get('type') == 'out']
+        try:
+            nodes = tuple(
+                freeze_value((node.id, node.uid, node.type, node.data))
+                for node in self
+            )
+            # Получатели упорядочиваются, а слоты остаются в порядке соединений:
+            # в этом порядке собирается node_inputs
+            connections = tuple(
+                freeze_value((target, slot, source, source_output))
+                for target in sorted(self.inputs)
+                for slot, (source, source_output) in self.inputs[target].items()
+            )
+        except TypeError:
+            return None
+
+        return (nodes, connections, tuple(self.input_ids), tuple(self.output_ids))
@@ -0,0 +1,34 @@
+from typing import Any, Dict, Iterable, Tuple
+
+
+def graph_json(nodes: Iterable[Tuple], connections: Iterable[str]) -> Dict[str, Any]:
+    '''
+    Строит граф в формате {'nodes': [...], 'connections': [...]} из краткой записи.
+
+    Args:
+    nodes: Кортежи (id, type, uid) или (id, type, uid, data); uid=None не записывается
+    connections: Строки вида 'source->target.targetInput'
+    или 'source.sourceOutput->target.targetInput'
+
+    Returns:
+    Новый словарь графа, который можно передать в Graph
+    '''
+    json_nodes = []
+    for node_id, node_type, uid, *data in nodes:
+        node = {'id': node_id, 'type': node_type}
+        if uid is not None:
+            node['uid'] = uid
+        if data:
+            node['data'] = data[0]
+        json_nodes.append(node)
+
+    json_connections = []
+    for spec in connections:
+        source, target = spec.split('->')
+        target, target_input = target.split('.')
+        conn = {'source': source, 'target': target, 'targetInput': target_input}
+        if '.' in source:
+            conn['source'], conn['sourceOutput'] = source.split('.')
+        json_connections.append(conn)
+
+    return {'nodes': json_nodes, 'connections': json_connections}
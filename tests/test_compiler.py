@@ -0,0 +1,499 @@
+import threading
+import unittest
+
+import numpy as np
+
+from graph_compiler import Graph, GraphCompiler
+
+from helpers import graph_json
+
+
+def add_node(node, node_inputs, results):
+    return node_inputs['a'] + node_inputs['b']
+
+
+def dot_node(node, node_inputs, results):
+    return np.dot(node_inputs['a'], node_inputs['b'])
+
+
+BINARY_GRAPH = graph_json(
+    [('a', 'in', 'a'), ('b', 'in', 'b'), ('op', 'compute', 'op'), ('result', 'out', 'result')],
+    ['a->op.a', 'b->op.b', 'op->result.value']
+)
+
+
+class ExecuteBatchTest(unittest.TestCase):
+    batch = [
+        {'a': np.array([1, 2]), 'b': np.array([2, 2])},
+        {'a': np.array([3, 3]), 'b': np.array([2, 3])},
+        {'a': np.array([1, 0]), 'b': np.array([2, 5])},
+    ]
+
+    def assert_matches_loop(self, compiled, results):
+        expected = [compiled.execute(input_values) for input_values in self.batch]
+        self.assertEqual(len(results), len(expected))
+        for result, reference in zip(results, expected):
+            self.assertEqual(result.keys(), reference.keys())
+            for uid in reference:
+                np.testing.assert_array_equal(result[uid], reference[uid])
+
+    def test_default_matches_loop_for_reducing_node(self):
+        compiled = GraphCompiler({'op': dot_node}).compile(Graph(BINARY_GRAPH))
+        results = compiled.execute_batch(self.batch)
+        self.assert_matches_loop(compiled, results)
+        self.assertEqual([int(r['result']) for r in results], [6, 15, 2])
+
+    def test_vectorized_matches_loop_for_elementwise_node(self):
+        compiled = GraphCompiler({'op': add_node}).compile(Graph(BINARY_GRAPH))
+        self.assert_matches_loop(compiled, compiled.execute_batch(self.batch, vectorized=True))
+
+    def test_vectorized_falls_back_once_when_inputs_do_not_stack(self):
+        calls = []
+
+        def counting_add(node, node_inputs, results):
+            calls.append(node.id)
+            return add_node(node, node_inputs, results)
+
+        compiled = GraphCompiler({'op': counting_add}).compile(Graph(BINARY_GRAPH))
+        batch = [{'a': np.arange(2), 'b': 1}, {'a': np.arange(3), 'b': 2}]
+        results = compiled.execute_batch(batch, vectorized=True)
+        self.assertEqual(len(calls), len(batch))
+        np.testing.assert_array_equal(results[1]['result'], [2, 3, 4])
+
+    def test_vectorized_rejects_outputs_without_batch_axis(self):
+        def total(node, node_inputs, results):
+            return np.sum(node_inputs['a'] + node_inputs['b'])
+
+        compiled = GraphCompiler({'op': total}).compile(Graph(BINARY_GRAPH))
+        with self.assertRaises(ValueError):
+            compiled.execute_batch(self.batch, vectorized=True)
+
+
+def scale_node(node, node_inputs, results):
+    return node_inputs['a'] * node.data['s']
+
+
+class CompileCacheTest(unittest.TestCase):
+    def scale_graph(self, scale):
+        return Graph(graph_json(
+            [('a', 'in', 'a'), ('op', 'compute', 'scale', {'s': scale}), ('result', 'out', 'result')],
+            ['a->op.a', 'op->result.value']
+        ))
+
+    def test_cache_is_disabled_by_default(self):
+        compiler = GraphCompiler({'scale': scale_node})
+        self.assertIsNot(compiler.compile(self.scale_graph(2)), compiler.compile(self.scale_graph(2)))
+
+    def test_cache_hit_for_identical_structure(self):
+        compiler = GraphCompiler({'scale': scale_node}, cache_size=4)
+        first = compiler.compile(self.scale_graph(2))
+        self.assertIs(compiler.compile(self.scale_graph(2)), first)
+
+    def test_equal_values_of_different_types_do_not_share_entry(self):
+        compiler = GraphCompiler({'scale': scale_node}, cache_size=4)
+        as_int = compiler.compile(self.scale_graph(2))
+        as_float = compiler.compile(self.scale_graph(2.0))
+        self.assertIsNot(as_int, as_float)
+
+        result = as_float.execute({'a': np.array([1, 2])})['result']
+        self.assertEqual(result.dtype, np.float64)
+        np.testing.assert_array_equal(result, [2.0, 4.0])
+
+        self.assertIsNot(
+            compiler.compile(self.scale_graph([1])),
+            compiler.compile(self.scale_graph((1,)))
+        )
+
+    def test_cached_result_matches_fresh_compile(self):
+        cached = GraphCompiler({'scale': scale_node}, cache_size=4)
+        cached.compile(self.scale_graph(3))
+        fresh = GraphCompiler({'scale': scale_node}).compile(self.scale_graph(3))
+        inputs = {'a': np.array([1, 2])}
+        np.testing.assert_array_equal(
+            cached.compile(self.scale_graph(3)).execute(inputs)['result'],
+            fresh.execute(inputs)['result']
+        )
+
+
+    def test_concurrent_compiles_with_eviction(self):
+        compiler = GraphCompiler({'scale': scale_node}, cache_size=1)
+        graphs = [self.scale_graph(scale) for scale in (2, 3)]
+        barrier = threading.Barrier(8)
+        errors = []
+
+        def compile_many(offset):
+            barrier.wait()
+            try:
+                for k in range(200):
+                    scale = 2 + (k + offset) % 2
+                    compiled = compiler.compile(graphs[scale - 2])
+                    self.assertEqual(compiled.execute({'a': 1})['result'], scale)
+            except Exception as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=compile_many, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(compiler._compile_cache), 1)
+
+class MemoizationTest(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+
+        def counting_add(node, node_inputs, results):
+            self.calls.append(node.id)
+            return add_node(node, node_inputs, results)
+
+        self.compiled = GraphCompiler({'op': counting_add}, enable_memoization=True).compile(
+            Graph(BINARY_GRAPH)
+        )
+
+    def test_repeated_inputs_are_served_from_cache(self):
+        for _ in range(3):
+            self.assertEqual(self.compiled.execute({'a': 1, 'b': 2})['result'], 3)
+        self.assertEqual(len(self.calls), 1)
+
+    def test_invalidate_forces_recomputation(self):
+        self.compiled.execute({'a': 1, 'b': 2})
+        self.compiled.invalidate('op')
+        self.compiled.execute({'a': 1, 'b': 2})
+        self.compiled.invalidate()
+        self.compiled.execute({'a': 1, 'b': 2})
+        self.assertEqual(len(self.calls), 3)
+
+
+class ReuseNodeInputsTest(unittest.TestCase):
+    cases = ({'a': 1, 'b': 2}, {'a': 3, 'b': 4}, {'a': 1, 'b': 2})
+
+    def test_repeated_calls_see_fresh_inputs(self):
+        compiled = GraphCompiler({'op': add_node}, reuse_node_inputs=True).compile(Graph(BINARY_GRAPH))
+        self.assertEqual([compiled.execute(inputs)['result'] for inputs in self.cases], [3, 7, 3])
+
+    def test_memoization_keys_on_reused_buffer_values(self):
+        calls = []
+
+        def counting_add(node, node_inputs, results):
+            calls.append(dict(node_inputs))
+            return add_node(node, node_inputs, results)
+
+        compiled = GraphCompiler(
+            {'op': counting_add}, reuse_node_inputs=True, enable_memoization=True
+        ).compile(Graph(BINARY_GRAPH))
+
+        self.assertEqual([compiled.execute(inputs)['result'] for inputs in self.cases], [3, 7, 3])
+        self.assertEqual(calls, [{'a': 1, 'b': 2}, {'a': 3, 'b': 4}])
+
+class DebugTest(unittest.TestCase):
+    def test_node_error_names_node_and_keeps_cause(self):
+        def divide(node, node_inputs, results):
+            return int(node_inputs['a']) // int(node_inputs['b'])
+
+        graph = Graph(graph_json(
+            [
+                ('a', 'in', 'a'),
+                ('b', 'in', 'b'),
+                ('sum', 'compute', 'add'),
+                ('div', 'compute', 'divide'),
+                ('total', 'out', 'total'),
+                ('ratio', 'out', 'ratio')
+            ],
+            ['a->sum.a', 'b->sum.b', 'a->div.a', 'b->div.b', 'sum->total.value', 'div->ratio.value']
+        ))
+
+        for options in ({}, {'max_workers': 2}):
+            with self.subTest(**options):
+                with GraphCompiler({'add': add_node, 'divide': divide}, debug=True, **options) as compiler:
+                    compiled = compiler.compile(graph)
+                    with self.assertRaisesRegex(RuntimeError, r"'div' \(uid='divide'\)") as context:
+                        compiled.execute({'a': 1, 'b': 0})
+                self.assertIsInstance(context.exception.__cause__, ZeroDivisionError)
+
+class InputDtypeTest(unittest.TestCase):
+    graph = Graph(graph_json(
+        [('a', 'in', 'a', {'dtype': 'float32'}), ('b', 'in', 'b'), ('op', 'compute', 'op'), ('result', 'out', 'result')],
+        ['a->op.a', 'b->op.b', 'op->result.value']
+    ))
+
+    def test_execute_casts_input(self):
+        for options in ({}, {'max_workers': 2}):
+            with self.subTest(**options):
+                with GraphCompiler({'op': add_node}, **options) as compiler:
+                    result = compiler.compile(self.graph).execute({'a': [1, 2], 'b': np.float32(1)})['result']
+                self.assertEqual(result.dtype, np.float32)
+                np.testing.assert_array_equal(result, [2, 3])
+
+    def test_execute_typed_skips_cast(self):
+        compiled = GraphCompiler({'op': add_node}).compile(self.graph)
+        (result,) = compiled.execute_typed(np.array([1, 2], dtype=np.int64), np.int64(1))
+        self.assertEqual(result.dtype, np.int64)
+
+def const_node(node, node_inputs, results):
+    return np.array(node.data['value'])
+
+
+def split_node(node, node_inputs, results):
+    x = node_inputs['x']
+    return {'double': x * 2, 'square': x ** 2}
+
+
+FOLDING_GRAPH = graph_json(
+    [
+        ('x', 'in', 'x'),
+        ('c', 'compute', 'const', {'value': 3}),
+        ('sp', 'compute', 'split'),
+        ('folded', 'compute', 'add'),
+        ('dynamic', 'compute', 'add'),
+        ('result', 'out', 'result'),
+        ('square', 'out', 'square')
+    ],
+    [
+        'c->sp.x',
+        'sp.double->folded.a',
+        'sp.square->folded.b',
+        'folded->dynamic.a',
+        'x->dynamic.b',
+        'dynamic->result.value',
+        'sp.square->square.value'
+    ]
+)
+'''Граф, в котором const -> split -> add не зависят от входов, а последний add зависит'''
+
+
+class FoldConstantsTest(unittest.TestCase):
+    def test_folded_output_matches_unfolded(self):
+        calls = []
+
+        def counting_add(node, node_inputs, results):
+            calls.append(node.id)
+            return add_node(node, node_inputs, results)
+
+        pool = {'const': const_node, 'split': split_node, 'add': counting_add}
+        graph = Graph(FOLDING_GRAPH)
+
+        for max_workers in (None, 2):
+            with self.subTest(max_workers=max_workers):
+                with GraphCompiler(pool, max_workers=max_workers, fold_constants=True) as compiler, \
+                        GraphCompiler(pool, max_workers=max_workers) as reference_compiler:
+                    folded = compiler.compile(graph)
+                    reference = reference_compiler.compile(graph)
+
+                    for x in (0, 1.5, np.arange(3)):
+                        expected = reference.execute({'x': x})
+                        del calls[:]
+                        actual = folded.execute({'x': x})
+                        self.assertEqual(calls, ['dynamic'])
+                        self.assertEqual(actual.keys(), expected.keys())
+                        for uid in expected:
+                            np.testing.assert_array_equal(actual[uid], expected[uid])
+
+
+class OutputNodeTest(unittest.TestCase):
+    def test_output_node_variants(self):
+        graph = Graph(graph_json(
+            [
+                ('x', 'in', 'x'),
+                ('sp', 'compute', 'split'),
+                ('empty', 'out', 'empty'),
+                ('single', 'out', 'single'),
+                ('multi', 'out', 'multi')
+            ],
+            ['x->sp.x', 'sp.square->single.value', 'x->multi.x', 'sp.double->multi.d']
+        ))
+
+        for options in ({}, {'max_workers': 2}):
+            with self.subTest(**options):
+                with GraphCompiler({'split': split_node}, **options) as compiler:
+                    outputs = compiler.compile(graph).execute({'x': 3})
+                self.assertEqual(outputs, {'empty': None, 'single': 9, 'multi': {'x': 3, 'd': 6}})
+
+
+class ExecuteTypedTest(unittest.TestCase):
+    graph = Graph(graph_json(
+        [
+            ('a', 'in', 'a'),
+            ('b', 'in', 'b'),
+            ('op', 'compute', 'add'),
+            ('sp', 'compute', 'split'),
+            ('result', 'out', 'result'),
+            ('square', 'out', 'square')
+        ],
+        ['a->op.a', 'b->op.b', 'a->sp.x', 'op->result.value', 'sp.square->square.value']
+    ))
+
+    def test_matches_execute(self):
+        arrays = (np.array([1.0, 2.0]), np.array([3.0, 4.0]))
+        progress = []
+        cases = (
+            ('typed', {}),
+            ('updater', {'updater': lambda fraction, node_id: progress.append(node_id)}),
+            ('levels', {'max_workers': 2})
+        )
+
+        for name, options in cases:
+            with self.subTest(name):
+                with GraphCompiler({'add': add_node, 'split': split_node}, **options) as compiler:
+                    compiled = compiler.compile(self.graph)
+                    self.assertEqual(compiled.typed_calculator is None, name == 'levels')
+
+                    outputs = compiled.execute(dict(zip(['a', 'b'], arrays)))
+                    typed = compiled.execute_typed(*arrays)
+
+                self.assertEqual(len(typed), len(compiled.output_ids))
+                for value, uid in zip(typed, compiled.output_ids):
+                    np.testing.assert_array_equal(value, outputs[uid])
+
+        # execute и execute_typed с updater проходят через tracked_calculator
+        self.assertEqual(progress, self.graph.sort * 2)
+
+
+def declared_split_node(node, node_inputs, results):
+    return split_node(node, node_inputs, results)
+
+
+declared_split_node.returns_dict = True
+
+
+def settings_node(node, node_inputs, results):
+    return {'scale': node_inputs['x']}
+
+
+settings_node.returns_dict = False
+
+
+def read_scale_node(node, node_inputs, results):
+    return node_inputs['settings']['scale']
+
+
+class ReturnsDictTest(unittest.TestCase):
+    def test_declared_dict_source_feeds_two_consumers(self):
+        graph = Graph(graph_json(
+            [('x', 'in', 'x'), ('sp', 'compute', 'split'), ('op', 'compute', 'add'), ('result', 'out', 'result')],
+            ['x->sp.x', 'sp.double->op.a', 'sp.square->op.b', 'op->result.value']
+        ))
+        for options in ({}, {'max_workers': 2}):
+            with self.subTest(**options):
+                with GraphCompiler({'split': declared_split_node, 'add': add_node}, **options) as compiler:
+                    self.assertEqual(compiler.compile(graph).execute({'x': 3})['result'], 15)
+
+    def test_declared_plain_source_is_passed_as_is(self):
+        # returns_dict = False: словарь-результат передается целиком, а не по выходу 'default'
+        graph = Graph(graph_json(
+            [('x', 'in', 'x'), ('st', 'compute', 'settings'), ('op', 'compute', 'read'), ('result', 'out', 'result')],
+            ['x->st.x', 'st->op.settings', 'op->result.value']
+        ))
+        for options in ({}, {'max_workers': 2}):
+            with self.subTest(**options):
+                with GraphCompiler({'settings': settings_node, 'read': read_scale_node}, **options) as compiler:
+                    self.assertEqual(compiler.compile(graph).execute({'x': 3})['result'], 3)
+
+
+def difference_kernel(b, a):
+    return b - a
+
+
+difference_kernel.input_slots = ('b', 'a')
+
+
+class KernelTest(unittest.TestCase):
+    def test_kernel_receives_inputs_in_slot_order(self):
+        inputs = {'a': np.array([1, 2]), 'b': np.array([10, 20])}
+        for options in ({}, {'max_workers': 2}, {'enable_memoization': True}, {'debug': True}):
+            with self.subTest(**options):
+                with GraphCompiler({'op': difference_kernel}, **options) as compiler:
+                    compiled = compiler.compile(Graph(BINARY_GRAPH))
+                    np.testing.assert_array_equal(compiled.execute(inputs)['result'], [9, 18])
+
+    def test_unconnected_kernel_slot_is_rejected_at_compile_time(self):
+        graph = Graph(graph_json(
+            [('a', 'in', 'a'), ('op', 'compute', 'op'), ('result', 'out', 'result')],
+            ['a->op.a', 'op->result.value']
+        ))
+        unfed = Graph(graph_json(
+            [('op', 'compute', 'op'), ('result', 'out', 'result')],
+            ['op->result.value']
+        ))
+        cases = ((graph, {}), (graph, {'max_workers': 2}), (unfed, {'fold_constants': True}))
+        for graph, options in cases:
+            with self.subTest(**options):
+                compiler = GraphCompiler({'op': difference_kernel}, **options)
+                with self.assertRaisesRegex(ValueError, r"'op' \(uid='op'\).*'b'"):
+                    compiler.compile(graph)
+
+
+class LevelCalculatorTest(unittest.TestCase):
+    def test_gil_bound_node_runs_while_pool_works(self):
+        pool_started = threading.Event()
+        overlapped = []
+
+        def numpy_node(node, node_inputs, results):
+            pool_started.set()
+            return node_inputs['x'] * node.data['k']
+
+        def python_node(node, node_inputs, results):
+            # Узел основного потока должен застать задачи уровня уже отправленными в пул
+            overlapped.append(pool_started.wait(timeout=5))
+            return sum(float(value) for value in node_inputs['x'])
+
+        python_node.release_gil = False
+
+        graph = Graph(graph_json(
+            [
+                ('x', 'in', 'x'),
+                ('py', 'compute', 'python'),
+                ('n1', 'compute', 'numpy', {'k': 2}),
+                ('n2', 'compute', 'numpy', {'k': 3}),
+                ('total', 'compute', 'add'),
+                ('result', 'out', 'result'),
+                ('sum', 'out', 'sum')
+            ],
+            ['x->py.x', 'x->n1.x', 'x->n2.x', 'n1->total.a', 'n2->total.b', 'total->result.value', 'py->sum.value']
+        ))
+        pool = {'python': python_node, 'numpy': numpy_node, 'add': add_node}
+        self.assertIn(['py', 'n1', 'n2'], graph.layers)
+
+        inputs = {'x': np.array([1.0, 2.0])}
+        pool_started.set()
+        expected = GraphCompiler(pool).compile(graph).execute(inputs)
+        pool_started.clear()
+        del overlapped[:]
+        with GraphCompiler(pool, max_workers=2) as compiler:
+            actual = compiler.compile(graph).execute(inputs)
+
+        self.assertEqual(overlapped, [True])
+        self.assertEqual(actual.keys(), expected.keys())
+        for uid in expected:
+            np.testing.assert_array_equal(actual[uid], expected[uid])
+
+class ExecutorTest(unittest.TestCase):
+    def test_concurrent_calls_share_one_executor(self):
+        compiler = GraphCompiler({'op': add_node}, max_workers=2)
+        barrier = threading.Barrier(8)
+        executors = []
+
+        def get_executor():
+            barrier.wait()
+            executors.append(compiler._get_executor())
+
+        threads = [threading.Thread(target=get_executor) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len({id(executor) for executor in executors}), 1)
+        compiler.close()
+
+    def test_context_manager_shuts_down_executor(self):
+        with GraphCompiler({'op': add_node}, max_workers=2) as compiler:
+            executor = compiler._get_executor()
+        self.assertIsNone(compiler._executor)
+        with self.assertRaises(RuntimeError):
+            executor.submit(int)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import copy
+import unittest
+
+from graph_compiler import Graph, GraphCompiler, SkeletonCache
+from graph_compiler.graph import skeleton_key
+
+from helpers import graph_json
+
+
+VARIABLE_GRAPH = graph_json(
+    [
+        ('s', 'in', 's'),
+        ('vin', 'variable', None, {'label': 'v', 'is_input': True}),
+        ('vout', 'variable', None, {'label': 'v'}),
+        ('op', 'compute', 'scale', {'s': 1}),
+        ('dead', 'compute', 'scale'),
+        ('o', 'out', 'o')
+    ],
+    ['s->vin.value', 'vout->op.x', 's->dead.x', 'op->o.input']
+)
+'''Граф s -> variable(label='v') -> op -> o с недостижимым узлом dead'''
+
+
+class SkeletonCacheTest(unittest.TestCase):
+    def assert_same_graph(self, graph, reference):
+        self.assertEqual(graph.sort, reference.sort)
+        self.assertEqual(graph.layers, reference.layers)
+        self.assertEqual(graph.inputs, reference.inputs)
+        self.assertEqual(graph.json_data, reference.json_data)
+
+    def test_cache_hit_matches_fresh_graph_with_new_data(self):
+        cache = SkeletonCache()
+        Graph(copy.deepcopy(VARIABLE_GRAPH), cache)
+
+        json_data = copy.deepcopy(VARIABLE_GRAPH)
+        json_data['nodes'][3]['data'] = {'s': 2}
+        cached = Graph(copy.deepcopy(json_data), cache)
+        self.assert_same_graph(cached, Graph(json_data))
+        self.assertEqual(cached.nodes['op'].data, {'s': 2})
+
+    def test_missing_and_none_source_output_do_not_share_entry(self):
+        cache = SkeletonCache()
+        Graph(copy.deepcopy(VARIABLE_GRAPH), cache)
+
+        json_data = copy.deepcopy(VARIABLE_GRAPH)
+        json_data['connections'][0]['sourceOutput'] = None
+        cached = Graph(copy.deepcopy(json_data), cache)
+        self.assert_same_graph(cached, Graph(json_data))
+        self.assertEqual(cached.inputs['op'], {'x': ('s', None)})
+
+    def test_cache_evicts_least_recently_used(self):
+        cache = SkeletonCache(max_size=2)
+        graphs = [copy.deepcopy(VARIABLE_GRAPH) for _ in range(3)]
+        graphs[1]['connections'][0]['sourceOutput'] = 'value'
+        graphs[2]['connections'][0]['sourceOutput'] = 'other'
+        first, second, third = (skeleton_key(json_data) for json_data in graphs)
+
+        Graph(graphs[0], cache)
+        Graph(graphs[1], cache)
+        Graph(copy.deepcopy(graphs[0]), cache)
+        Graph(graphs[2], cache)
+
+        self.assertEqual(list(cache._entries), [first, third])
+        self.assertNotIn(second, cache._entries)
+
+
+class OptimizeGraphTest(unittest.TestCase):
+    def test_variable_nodes_keep_source_output(self):
+        def split(node, node_inputs, results):
+            return {'double': node_inputs['x'] * 2, 'square': node_inputs['x'] ** 2}
+
+        graph = Graph(graph_json(
+            [
+                ('x', 'in', 'x'),
+                ('sp', 'compute', 'split'),
+                ('vin', 'variable', None, {'label': 'v', 'is_input': True}),
+                ('vout', 'variable', None, {'label': 'v'}),
+                ('square', 'out', 'square'),
+                ('double', 'out', 'double')
+            ],
+            ['x->sp.x', 'sp.square->vin.value', 'vout->square.input', 'sp.double->double.input']
+        ))
+        self.assertEqual(graph.inputs['square'], {'input': ('sp', 'square')})
+        self.assertNotIn('vin', graph.nodes)
+
+        for options in ({}, {'max_workers': 2}):
+            with self.subTest(**options):
+                with GraphCompiler({'split': split}, **options) as compiler:
+                    outputs = compiler.compile(graph).execute({'x': 3})
+                self.assertEqual(outputs, {'square': 9, 'double': 6})
+
+class TopologicalSortTest(unittest.TestCase):
+    def test_node_fed_twice_by_one_source_is_sorted(self):
+        graph = Graph(graph_json(
+            [('i', 'in', 'i'), ('k', 'compute', 'add'), ('o', 'out', 'O')],
+            ['i->k.a', 'i->k.b', 'k->o.input']
+        ))
+        self.assertEqual(graph.sort, ['i', 'k', 'o'])
+        self.assertEqual(graph.layers, [['i'], ['k'], ['o']])
+
+if __name__ == '__main__':
+    unittest.main()